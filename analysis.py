@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+
+from board import Board, ROWS, COLS, RED, WHITE, RED_VALUES
+from engine import best_move
+
+# Analysis settings
+ANALYSIS_WORKERS = 2
+HINT_DEPTH = 6
+ANALYZE_DEPTH = 8
+CACHE_SIZE = 4096      # Positions kept in the result cache
+CACHE_TTL = 300        # Seconds a cached result stays valid
+MAX_PENDING = 8        # Searches queued or running at once; more are turned away as busy
+STALE_AFTER = 5        # Seconds without a request before a queued search is dropped
+
+def position_key(board_data, turn, depth):
+    # Compact, hashable snapshot of a position: one character per square,
+    # then the side to move and the search depth
+    squares = []
+    for row in board_data:
+        for piece_data in row:
+            if piece_data is None:
+                squares.append('.')
+            else:
+                char = 'r' if piece_data['color'] in RED_VALUES else 'w'
+                squares.append(char.upper() if piece_data['king'] else char)
+    side = 'r' if turn in RED_VALUES else 'w'
+    return f"{''.join(squares)}{side}{depth}"
+
+def board_from_key(key):
+    data = []
+    for row in range(ROWS):
+        data_row = []
+        for col in range(COLS):
+            char = key[row * COLS + col]
+            if char == '.':
+                data_row.append(None)
+            else:
+                data_row.append({
+                    'color': RED if char in 'rR' else WHITE,
+                    'king': char.isupper(),
+                    'row': row,
+                    'col': col
+                })
+        data.append(data_row)
+    board = Board()
+    board.deserialize(data)
+    turn = RED if key[ROWS * COLS] == 'r' else WHITE
+    return board, turn, int(key[ROWS * COLS + 1:])
+
+def analyze_position(key):
+    # Runs in a worker process
+    board, turn, depth = board_from_key(key)
+    start = time.perf_counter()
+    move, score = best_move(board, turn, depth)
+    if move is not None:
+        move = {'from': move[0], 'to': move[1], 'captured': move[2]}
+    return {
+        'move': move,
+        'score': score,  # From the side to move's point of view
+        'turn': turn,
+        'depth': depth,
+        'search_time': time.perf_counter() - start
+    }
+
+class AnalysisService:
+    # Runs searches on a process pool so socket threads never wait on them.
+    # Requests for a position that is already being searched share that
+    # search, and finished results are kept in a TTL/LRU cache. Clients poll
+    # while a search is pending, so a queued search nobody has asked about
+    # lately is for a position that has moved on and can be dropped.
+    def __init__(self, workers=ANALYSIS_WORKERS, cache_size=CACHE_SIZE, ttl=CACHE_TTL,
+                 max_pending=MAX_PENDING, stale_after=STALE_AFTER):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self.executor = None
+        self.cache = OrderedDict()  # key -> (expires, result)
+        self.pending = {}           # key -> future of the queued or running search
+        self.polled = {}            # key -> time of the last request for a pending search
+        self.lock = threading.RLock()  # Cancelling a future runs _finish on this thread
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.searches = 0
+        self.busy = 0
+        self.dropped = 0
+
+    def _executor(self):
+        if self.executor is None:
+            # Imported here so servers that never analyze start without them
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Spawned workers do not inherit the server's threads and locks
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def request(self, board_data, turn, depth):
+        # Returns ('ready', result), ('pending', None) while the search runs,
+        # or ('busy', None) when too many searches are already waiting
+        key = position_key(board_data, turn, depth)
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            result = self._cached(key)
+            if result is not None:
+                self.cache_hits += 1
+                return 'ready', result
+            if key in self.pending:
+                self.coalesced += 1
+                self.polled[key] = now
+                return 'pending', None
+            if len(self.pending) >= self.max_pending:
+                self._drop_stale(now)
+                if len(self.pending) >= self.max_pending:
+                    self.busy += 1
+                    return 'busy', None
+
+            self.searches += 1
+            try:
+                future = self._executor().submit(analyze_position, key)
+            except RuntimeError:
+                # A worker died (BrokenProcessPool, a RuntimeError, so the
+                # pool module need not be imported here); start a fresh
+                # pool and try once more
+                self.executor = None
+                future = self._executor().submit(analyze_position, key)
+            self.pending[key] = future
+            self.polled[key] = now
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return 'pending', None
+
+    def _drop_stale(self, now):
+        # Searches already handed to a worker cannot be cancelled and finish anyway
+        for key, future in list(self.pending.items()):
+            if now - self.polled[key] > self.stale_after and future.cancel():
+                self.dropped += 1
+
+    def _cached(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.monotonic():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return result
+
+    def _finish(self, key, future):
+        with self.lock:
+            self.pending.pop(key, None)
+            self.polled.pop(key, None)
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                print(f"Analysis failed: {future.exception()}")
+                return
+            self.cache[key] = (time.monotonic() + self.ttl, future.result())
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'cache_hits': self.cache_hits,
+                'coalesced': self.coalesced,
+                'searches': self.searches,
+                'busy': self.busy,
+                'dropped': self.dropped,
+                'running': len(self.pending),
+                'cached': len(self.cache)
+            }
@@ -0,0 +1,268 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+from board import Board, ROWS, COLS, RED, WHITE
+from engine import best_move
+from transport import HEADER_SIZE, recv_message
+
+BENCH_PORT = 5600
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEADLESS_MODULES = ["board", "matchmaking", "server", "sharding"]
+
+def send_message(sock, data):
+    json_data = json.dumps(data)
+    sock.sendall((f"{len(json_data):<{HEADER_SIZE}}" + json_data).encode())
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def room_client(port, room, requests):
+    # One player in its own room polling the game state as fast as it can
+    sock = socket.create_connection(("127.0.0.1", port))
+    send_message(sock, {'type': 'join', 'room': room})
+    recv_message(sock)
+    for _ in range(requests):
+        send_message(sock, {'type': 'get_state'})
+        recv_message(sock)
+    sock.close()
+    return requests
+
+def bench_sharding(worker_counts, clients, requests, port=BENCH_PORT):
+    print(f"{'workers':>8} {'clients':>8} {'requests/s':>12}")
+    for workers in worker_counts:
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "server.py"), "--workers", str(workers), "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        try:
+            if not wait_for_port(port):
+                print(f"Server with {workers} workers did not start")
+                continue
+            with multiprocessing.Pool(clients) as pool:
+                start = time.perf_counter()
+                done = pool.starmap(room_client, [(port, f"bench-{i}", requests) for i in range(clients)])
+                elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {clients:>8} {sum(done) / elapsed:>12.0f}")
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        port += 1
+
+def time_import(module, runs):
+    # Median wall time of a fresh interpreter importing the module
+    code = f"import sys, {module}; print('pygame' in sys.modules)"
+    times = []
+    loads_pygame = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, None
+        loads_pygame = result.stdout.strip() == "True"
+    times.sort()
+    return times[len(times) // 2], loads_pygame
+
+def bench_startup(runs, port=BENCH_PORT):
+    baseline, _ = time_import("os", runs)
+    print(f"{'entry point':<14} {'cold start ms':>14} {'imports pygame':>15}")
+    print(f"{'(python)':<14} {baseline * 1000:>14.1f} {'':>15}")
+    for module in HEADLESS_MODULES + ["main"]:
+        elapsed, loads_pygame = time_import(module, runs)
+        if elapsed is None:
+            print(f"{module:<14} {'failed to import':>14}")
+            continue
+        print(f"{module:<14} {elapsed * 1000:>14.1f} {str(loads_pygame):>15}")
+        if loads_pygame and module in HEADLESS_MODULES:
+            print(f"  {module} is a headless entry point but imported pygame")
+
+    # Time from launching the server until it accepts connections
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "server.py"), "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    try:
+        if wait_for_port(port):
+            print(f"{'server ready':<14} {(time.perf_counter() - start) * 1000:>14.1f}")
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+def random_game_states(seed=1, max_moves=200):
+    # Serialized positions of a random game, as JSON-decoded by the client
+    rng = random.Random(seed)
+    board = Board()
+    turn = RED
+    states = [json.loads(json.dumps(board.serialize()))]
+    for _ in range(max_moves):
+        moves = []
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = board.get_piece(row, col)
+                if piece != 0 and piece.color == turn:
+                    moves.extend((piece, move, skipped) for move, skipped in board.get_valid_moves(piece).items())
+        if not moves or board.winner():
+            break
+        piece, (row, col), skipped = rng.choice(moves)
+        board.move(piece, row, col)
+        if skipped:
+            board.remove(skipped)
+        turn = WHITE if turn == RED else RED
+        states.append(json.loads(json.dumps(board.serialize())))
+    return states
+
+def bench_deserialize(rounds):
+    states = random_game_states()
+    board = Board()
+    board.deserialize(states[0])
+
+    tracemalloc.start()
+    peaks = []
+    blocks = 0
+    for _ in range(rounds):
+        for state in states:
+            # Hold on to the previous board so anything the update replaces
+            # rather than reuses still shows up as a new allocation
+            previous = board.board
+            before = tracemalloc.take_snapshot()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            board.deserialize(state)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            after = tracemalloc.take_snapshot()
+            blocks += sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+            del previous
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for state in states:
+            board.deserialize(state)
+    elapsed = time.perf_counter() - start
+
+    updates = rounds * len(states)
+    print(f"{updates} updates over a {len(states)}-position game")
+    print(f"blocks allocated per update: {blocks / updates:.2f}")
+    print(f"peak bytes per update:       {sum(peaks) / updates:.0f}")
+    print(f"time per update:             {elapsed / updates * 1e6:.1f} us")
+
+def start_bench_server(port, workers=None):
+    command = [sys.executable, os.path.join(HERE, "server.py"), "--port", str(port)]
+    if workers:
+        command += ["--workers", str(workers)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, start_new_session=True)
+    if not wait_for_port(port):
+        os.killpg(server.pid, signal.SIGTERM)
+        raise RuntimeError("benchmark server did not start")
+    return server
+
+def drain(sock, counts):
+    # Read pushed states until the server closes the connection
+    try:
+        while recv_message(sock) is not None:
+            counts[0] += 1
+    except OSError:
+        pass
+
+def bench_broadcast(watchers, moves, port=BENCH_PORT):
+    print(f"{'compression':<12} {'messages':>9} {'syscalls/msg':>13} {'payload B':>10} {'wire B':>10} {'wire/payload':>13}")
+    for compression in ([], ['zlib']):
+        # One sharded worker so the room, its watchers and the stats share a process
+        server = start_bench_server(port, workers=1)
+        sockets = []
+        try:
+            players = []
+            for _ in range(2):
+                sock = socket.create_connection(("127.0.0.1", port))
+                send_message(sock, {'type': 'join', 'room': 'bench'})
+                recv_message(sock)
+                recv_message(sock)
+                players.append(sock)
+                sockets.append(sock)
+
+            received = [0]
+            for _ in range(watchers):
+                sock = socket.create_connection(("127.0.0.1", port))
+                send_message(sock, {'type': 'watch', 'room': 'bench'})
+                recv_message(sock)
+                recv_message(sock)
+                send_message(sock, {'type': 'hello', 'compression': compression})
+                recv_message(sock)
+                thread = threading.Thread(target=drain, args=(sock, received))
+                thread.daemon = True
+                thread.start()
+                sockets.append(sock)
+
+            # Play engine moves so every move is legal
+            board = Board()
+            turn = RED
+            for i in range(moves):
+                move, _ = best_move(board, turn, 1)
+                if move is None or board.winner():
+                    break
+                send_message(players[i % 2], {'type': 'move', 'from': move[0], 'to': move[1], 'captured': move[2]})
+                recv_message(players[i % 2])
+                board.make_move(board.get_piece(*move[0]), *move[1], [board.get_piece(*c) for c in move[2]])
+                turn = WHITE if turn == RED else RED
+
+            time.sleep(0.2)  # Let the last tick flush
+            send_message(players[0], {'type': 'transport_stats'})
+            stats = recv_message(players[0])
+            label = compression[0] if compression else "none"
+            print(f"{label:<12} {stats['messages']:>9} {stats['syscalls_per_message']:>13.3f} "
+                  f"{stats['payload_bytes']:>10} {stats['wire_bytes']:>10} {stats['wire_ratio']:>13.3f}")
+        finally:
+            for sock in sockets:
+                sock.close()
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        port += 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkers performance benchmarks")
+    subparsers = parser.add_subparsers(dest='bench', required=True)
+
+    sharding_parser = subparsers.add_parser('sharding', help="aggregate throughput as worker processes are added")
+    sharding_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    sharding_parser.add_argument('--clients', type=int, default=2 * (os.cpu_count() or 1))
+    sharding_parser.add_argument('--requests', type=int, default=2000)
+
+    startup_parser = subparsers.add_parser('startup', help="cold-start time of each entry point")
+    startup_parser.add_argument('--runs', type=int, default=9)
+
+    deserialize_parser = subparsers.add_parser('deserialize', help="allocations per board state update")
+    deserialize_parser.add_argument('--rounds', type=int, default=5)
+
+    broadcast_parser = subparsers.add_parser('broadcast', help="syscalls and bytes for state broadcasts to watchers")
+    broadcast_parser.add_argument('--watchers', type=int, default=50)
+    broadcast_parser.add_argument('--moves', type=int, default=60)
+
+    args = parser.parse_args()
+    if args.bench == 'sharding':
+        bench_sharding(args.workers, args.clients, args.requests)
+    elif args.bench == 'startup':
+        bench_startup(args.runs)
+    elif args.bench == 'deserialize':
+        bench_deserialize(args.rounds)
+    elif args.bench == 'broadcast':
+        bench_broadcast(args.watchers, args.moves)
@@ -0,0 +1,347 @@
+# Checkers rules shared by the client, the server and headless tools.
+# Nothing here may import pygame.
+
+# Constants
+WIDTH, HEIGHT = 800, 800
+ROWS, COLS = 8, 8
+SQUARE_SIZE = WIDTH // COLS
+
+# Colors
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
+RED_VALUES = (RED, list(RED))  # Colors arrive as lists after a JSON round trip
+
+# Pixel center of every square, indexed [row][col]
+SQUARE_CENTERS = [
+    [(SQUARE_SIZE * col + SQUARE_SIZE // 2, SQUARE_SIZE * row + SQUARE_SIZE // 2) for col in range(COLS)]
+    for row in range(ROWS)
+]
+
+class Piece:
+    __slots__ = ('row', 'col', 'color', 'king', 'x', 'y')
+
+    def __init__(self, row, col, color):
+        self.row = row
+        self.col = col
+        self.color = color
+        self.king = False
+        self.calc_pos()
+
+    def calc_pos(self):
+        self.x, self.y = SQUARE_CENTERS[self.row][self.col]
+
+    def make_king(self):
+        self.king = True
+
+    def move(self, row, col):
+        self.row = row
+        self.col = col
+        self.calc_pos()
+
+    def __repr__(self):
+        return str(self.color)
+
+class Board:
+    def __init__(self):
+        self.board = []
+        self.red_left = self.white_left = 12
+        self.red_kings = self.white_kings = 0
+        self.pool = []  # Pieces taken off the board, reused by deserialize
+        self.create_board()
+
+    def create_board(self):
+        for row in range(ROWS):
+            self.board.append([])
+            for col in range(COLS):
+                if col % 2 == ((row + 1) % 2):
+                    if row < 3:
+                        self.board[row].append(Piece(row, col, WHITE))
+                    elif row > 4:
+                        self.board[row].append(Piece(row, col, RED))
+                    else:
+                        self.board[row].append(0)
+                else:
+                    self.board[row].append(0)
+
+    def move(self, piece, row, col):
+        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
+        piece.move(row, col)
+
+        if row == ROWS - 1 or row == 0:
+            piece.make_king()
+            if piece.color == RED:
+                self.red_kings += 1
+            else:
+                self.white_kings += 1
+
+    def make_move(self, piece, row, col, skipped=()):
+        # Apply a move and return a compact record that unmake_move reverses:
+        # (piece, from_row, from_col, to_row, to_col, captured, promoted)
+        from_row, from_col = piece.row, piece.col
+        self.board[from_row][from_col] = 0
+        self.board[row][col] = piece
+        piece.move(row, col)
+
+        promoted = not piece.king and (row == ROWS - 1 or row == 0)
+        if promoted:
+            piece.make_king()
+            if piece.color == RED:
+                self.red_kings += 1
+            else:
+                self.white_kings += 1
+
+        captured = tuple(skipped)
+        for other in captured:
+            self.board[other.row][other.col] = 0
+            if other.color == RED:
+                self.red_left -= 1
+                self.red_kings -= other.king
+            else:
+                self.white_left -= 1
+                self.white_kings -= other.king
+
+        return (piece, from_row, from_col, row, col, captured, promoted)
+
+    def unmake_move(self, record):
+        piece, from_row, from_col, row, col, captured, promoted = record
+        self.board[row][col] = 0
+        self.board[from_row][from_col] = piece
+        piece.move(from_row, from_col)
+
+        if promoted:
+            piece.king = False
+            if piece.color == RED:
+                self.red_kings -= 1
+            else:
+                self.white_kings -= 1
+
+        # Captured pieces keep their square, so they drop straight back in
+        for other in captured:
+            self.board[other.row][other.col] = other
+            if other.color == RED:
+                self.red_left += 1
+                self.red_kings += other.king
+            else:
+                self.white_left += 1
+                self.white_kings += other.king
+
+    def get_piece(self, row, col):
+        return self.board[row][col]
+
+    def get_valid_moves(self, piece):
+        moves = {}
+        left = piece.col - 1
+        right = piece.col + 1
+        row = piece.row
+
+        if piece.color == RED or piece.king:
+            moves.update(self._traverse_left(row - 1, max(row - 3, -1), -1, piece.color, left))
+            moves.update(self._traverse_right(row - 1, max(row - 3, -1), -1, piece.color, right))
+
+        if piece.color == WHITE or piece.king:
+            moves.update(self._traverse_left(row + 1, min(row + 3, ROWS), 1, piece.color, left))
+            moves.update(self._traverse_right(row + 1, min(row + 3, ROWS), 1, piece.color, right))
+
+        return moves
+
+    def _traverse_left(self, start, stop, step, color, left, skipped=[]):
+        moves = {}
+        last = []
+        for r in range(start, stop, step):
+            if left < 0:
+                break
+
+            current = self.board[r][left]
+            if current == 0:
+                if skipped and not last:
+                    break
+                elif skipped:
+                    moves[(r, left)] = last + skipped
+                else:
+                    moves[(r, left)] = last
+
+                if last:
+                    if step == -1:
+                        row = max(r - 3, 0)
+                    else:
+                        row = min(r + 3, ROWS)
+                    moves.update(self._traverse_left(r + step, row, step, color, left - 1, skipped=last))
+                    moves.update(self._traverse_right(r + step, row, step, color, left + 1, skipped=last))
+                break
+            elif current.color == color:
+                break
+            else:
+                last = [current]
+
+            left -= 1
+
+        return moves
+
+    def _traverse_right(self, start, stop, step, color, right, skipped=[]):
+        moves = {}
+        last = []
+        for r in range(start, stop, step):
+            if right >= COLS:
+                break
+
+            current = self.board[r][right]
+            if current == 0:
+                if skipped and not last:
+                    break
+                elif skipped:
+                    moves[(r, right)] = last + skipped
+                else:
+                    moves[(r, right)] = last
+
+                if last:
+                    if step == -1:
+                        row = max(r - 3, 0)
+                    else:
+                        row = min(r + 3, ROWS)
+                    moves.update(self._traverse_left(r + step, row, step, color, right - 1, skipped=last))
+                    moves.update(self._traverse_right(r + step, row, step, color, right + 1, skipped=last))
+                break
+            elif current.color == color:
+                break
+            else:
+                last = [current]
+
+            right += 1
+
+        return moves
+
+    def remove(self, pieces):
+        for piece in pieces:
+            self.board[piece.row][piece.col] = 0
+            if piece.color == RED:
+                self.red_left -= 1
+            else:
+                self.white_left -= 1
+
+    def winner(self):
+        if self.red_left <= 0:
+            return WHITE
+        elif self.white_left <= 0:
+            return RED
+        return None
+
+    def serialize(self):
+        # Convert board to serializable format
+        serialized = []
+        for row in range(ROWS):
+            serialized_row = []
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece == 0:
+                    serialized_row.append(None)
+                else:
+                    serialized_row.append({
+                        'color': piece.color,
+                        'king': piece.king,
+                        'row': piece.row,
+                        'col': piece.col
+                    })
+            serialized.append(serialized_row)
+        return serialized
+
+    def deserialize(self, data):
+        # Bring the board in line with serialized data, touching only the
+        # squares that changed and reusing pieces instead of allocating
+        self.red_left = self.white_left = 0
+        self.red_kings = self.white_kings = 0
+        
+        for row in range(ROWS):
+            board_row = self.board[row]
+            data_row = data[row]
+            for col in range(COLS):
+                piece_data = data_row[col]
+                current = board_row[col]
+                if piece_data is None:
+                    if current != 0:
+                        self.pool.append(current)
+                        board_row[col] = 0
+                    continue
+                
+                color = RED if piece_data['color'] in RED_VALUES else WHITE
+                king = piece_data['king']
+                if current == 0:
+                    current = board_row[col] = self._take_piece(row, col)
+                current.color = color
+                current.king = king
+                
+                if color == RED:
+                    self.red_left += 1
+                    if king:
+                        self.red_kings += 1
+                else:
+                    self.white_left += 1
+                    if king:
+                        self.white_kings += 1
+
+    def _take_piece(self, row, col):
+        if not self.pool:
+            return Piece(row, col, RED)
+        piece = self.pool.pop()
+        piece.move(row, col)
+        return piece
+
+class History:
+    # Undo/redo over a board built on make_move/unmake_move records, so
+    # scrubbing through a game never copies or rebuilds the board
+    def __init__(self, board):
+        self.board = board
+        self.done = []    # records of applied moves, oldest first
+        self.undone = []  # records taken back, most recent last
+
+    def __len__(self):
+        return len(self.done) + len(self.undone)
+
+    def position(self):
+        return len(self.done)
+
+    def push(self, from_square, to_square, captured=()):
+        # Moves are given as (row, col) squares and always go on the end of
+        # the game; a board that was scrubbed back stays where it was.
+        # Raises ValueError, leaving the history unchanged, if the move is
+        # not legal at the end of the game.
+        position = self.position()
+        scrubbed = bool(self.undone)
+        self.seek(len(self))
+        try:
+            self.done.append(self._make_logged_move(from_square, to_square, captured))
+        finally:
+            if scrubbed:
+                self.seek(position)
+
+    def _make_logged_move(self, from_square, to_square, captured):
+        squares = [tuple(from_square), tuple(to_square)] + [tuple(square) for square in captured]
+        if not all(len(square) == 2 and 0 <= square[0] < ROWS and 0 <= square[1] < COLS for square in squares):
+            raise ValueError(f"Square off the board in move {squares}")
+        piece = self.board.get_piece(*squares[0])
+        if piece == 0:
+            raise ValueError(f"No piece on {squares[0]}")
+        skipped = self.board.get_valid_moves(piece).get(squares[1])
+        if skipped is None or sorted((p.row, p.col) for p in skipped) != sorted(squares[2:]):
+            raise ValueError(f"Illegal move from {squares[0]} to {squares[1]}")
+        return self.board.make_move(piece, *squares[1], skipped)
+
+    def undo(self):
+        if not self.done:
+            return False
+        record = self.done.pop()
+        self.board.unmake_move(record)
+        self.undone.append(record)
+        return True
+
+    def redo(self):
+        if not self.undone:
+            return False
+        piece, _, _, row, col, captured, _ = self.undone.pop()
+        self.done.append(self.board.make_move(piece, row, col, captured))
+        return True
+
+    def seek(self, position):
+        while self.position() > position and self.undo():
+            pass
+        while self.position() < position and self.redo():
+            pass
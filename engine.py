@@ -0,0 +1,79 @@
+from board import ROWS, COLS, RED, WHITE
+
+# Evaluation weights
+PIECE_VALUE = 1.0
+KING_VALUE = 1.5
+WIN_SCORE = 1000.0
+DEFAULT_DEPTH = 4
+DEFAULT_WEIGHTS = (PIECE_VALUE, KING_VALUE)
+
+def other_color(color):
+    return WHITE if color == RED else RED
+
+def get_all_moves(board, color):
+    # Every (piece, (row, col), skipped) move for a color, captures first
+    moves = []
+    for row in range(ROWS):
+        for col in range(COLS):
+            piece = board.board[row][col]
+            if piece != 0 and piece.color == color:
+                for move, skipped in board.get_valid_moves(piece).items():
+                    moves.append((piece, move, skipped))
+    moves.sort(key=lambda m: -len(m[2]))
+    return moves
+
+def evaluate(board, color, weights=DEFAULT_WEIGHTS):
+    # Material balance from color's point of view; weights are
+    # (piece value, king value)
+    piece_value, king_value = weights
+    score = (board.red_left - board.white_left) * piece_value
+    score += (board.red_kings - board.white_kings) * (king_value - piece_value)
+    return score if color == RED else -score
+
+def negamax(board, color, depth, alpha=-WIN_SCORE - 1, beta=WIN_SCORE + 1, weights=DEFAULT_WEIGHTS, ply=0):
+    # Alpha-beta search; moves are made and unmade on the one board. Wins
+    # score WIN_SCORE less the plies from the root, so a faster win (and a
+    # slower loss) is preferred.
+    if board.red_left <= 0 or board.white_left <= 0:
+        return WIN_SCORE - ply if evaluate(board, color) > 0 else ply - WIN_SCORE
+    if depth == 0:
+        return evaluate(board, color, weights)
+
+    moves = get_all_moves(board, color)
+    if not moves:
+        return ply - WIN_SCORE
+
+    best = -WIN_SCORE - 1
+    opponent = other_color(color)
+    for piece, (row, col), skipped in moves:
+        record = board.make_move(piece, row, col, skipped)
+        score = -negamax(board, opponent, depth - 1, -beta, -alpha, weights, ply + 1)
+        board.unmake_move(record)
+
+        if score > best:
+            best = score
+        if best > alpha:
+            alpha = best
+        if alpha >= beta:
+            break
+    return best
+
+def best_move(board, color, depth=DEFAULT_DEPTH, weights=DEFAULT_WEIGHTS):
+    # Returns ((from_square, to_square, captured_squares), score), or
+    # (None, score) when the color has no moves
+    best = None
+    best_score = -WIN_SCORE - 1
+    alpha = -WIN_SCORE - 1
+    opponent = other_color(color)
+    for piece, (row, col), skipped in get_all_moves(board, color):
+        move = ((piece.row, piece.col), (row, col), [(p.row, p.col) for p in skipped])
+        record = board.make_move(piece, row, col, skipped)
+        score = -negamax(board, opponent, depth - 1, -WIN_SCORE - 1, -alpha, weights, 1)
+        board.unmake_move(record)
+
+        if score > best_score:
+            best, best_score = move, score
+            alpha = max(alpha, score)
+    if best is None:
+        return None, -WIN_SCORE
+    return best, best_score
@@ -4,18 +4,12 @@ import socket
 import threading
 import json
 import time
+import queue
 
-# Initialize pygame
-pygame.init()
-
-# Constants
-WIDTH, HEIGHT = 800, 800
-ROWS, COLS = 8, 8
-SQUARE_SIZE = WIDTH // COLS
+from board import Board, History, WIDTH, HEIGHT, ROWS, COLS, SQUARE_SIZE, RED, WHITE
+from transport import CODECS, HEADER_SIZE, recv_message
 
 # Colors
-RED = (255, 0, 0)
-WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
@@ -24,236 +18,33 @@ CROWN = (255, 215, 0)  # Gold color for king pieces
 
 # Network settings
 PORT = 5555
-HEADER_SIZE = 10
-
-class Piece:
-    PADDING = 15
-    OUTLINE = 2
-
-    def __init__(self, row, col, color):
-        self.row = row
-        self.col = col
-        self.color = color
-        self.king = False
-        self.x = 0
-        self.y = 0
-        self.calc_pos()
-
-    def calc_pos(self):
-        self.x = SQUARE_SIZE * self.col + SQUARE_SIZE // 2
-        self.y = SQUARE_SIZE * self.row + SQUARE_SIZE // 2
-
-    def make_king(self):
-        self.king = True
-
-    def draw(self, win):
-        radius = SQUARE_SIZE // 2 - self.PADDING
-        pygame.draw.circle(win, GREY, (self.x, self.y), radius + self.OUTLINE)
-        pygame.draw.circle(win, self.color, (self.x, self.y), radius)
-        if self.king:
-            # Draw a crown symbol
-            pygame.draw.circle(win, CROWN, (self.x, self.y), radius // 2)
-
-    def move(self, row, col):
-        self.row = row
-        self.col = col
-        self.calc_pos()
-
-    def __repr__(self):
-        return str(self.color)
-
-class Board:
-    def __init__(self):
-        self.board = []
-        self.red_left = self.white_left = 12
-        self.red_kings = self.white_kings = 0
-        self.create_board()
-
-    def draw_squares(self, win):
-        win.fill(BLACK)
-        for row in range(ROWS):
-            for col in range(row % 2, COLS, 2):
-                pygame.draw.rect(win, RED, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-    def create_board(self):
-        for row in range(ROWS):
-            self.board.append([])
-            for col in range(COLS):
-                if col % 2 == ((row + 1) % 2):
-                    if row < 3:
-                        self.board[row].append(Piece(row, col, WHITE))
-                    elif row > 4:
-                        self.board[row].append(Piece(row, col, RED))
-                    else:
-                        self.board[row].append(0)
-                else:
-                    self.board[row].append(0)
-
-    def draw(self, win):
-        self.draw_squares(win)
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece != 0:
-                    piece.draw(win)
-
-    def move(self, piece, row, col):
-        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
-        piece.move(row, col)
-
-        if row == ROWS - 1 or row == 0:
-            piece.make_king()
-            if piece.color == RED:
-                self.red_kings += 1
-            else:
-                self.white_kings += 1
-
-    def get_piece(self, row, col):
-        return self.board[row][col]
-
-    def get_valid_moves(self, piece):
-        moves = {}
-        left = piece.col - 1
-        right = piece.col + 1
-        row = piece.row
-
-        if piece.color == RED or piece.king:
-            moves.update(self._traverse_left(row - 1, max(row - 3, -1), -1, piece.color, left))
-            moves.update(self._traverse_right(row - 1, max(row - 3, -1), -1, piece.color, right))
-
-        if piece.color == WHITE or piece.king:
-            moves.update(self._traverse_left(row + 1, min(row + 3, ROWS), 1, piece.color, left))
-            moves.update(self._traverse_right(row + 1, min(row + 3, ROWS), 1, piece.color, right))
-
-        return moves
-
-    def _traverse_left(self, start, stop, step, color, left, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if left < 0:
-                break
-
-            current = self.board[r][left]
-            if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r, left)] = last + skipped
-                else:
-                    moves[(r, left)] = last
-
-                if last:
-                    if step == -1:
-                        row = max(r - 3, 0)
-                    else:
-                        row = min(r + 3, ROWS)
-                    moves.update(self._traverse_left(r + step, row, step, color, left - 1, skipped=last))
-                    moves.update(self._traverse_right(r + step, row, step, color, left + 1, skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
+SERVER_START_TIMEOUT = 5
 
-            left -= 1
+# Piece drawing
+PIECE_PADDING = 15
+PIECE_OUTLINE = 2
 
-        return moves
+def draw_piece(win, piece):
+    radius = SQUARE_SIZE // 2 - PIECE_PADDING
+    pygame.draw.circle(win, GREY, (piece.x, piece.y), radius + PIECE_OUTLINE)
+    pygame.draw.circle(win, piece.color, (piece.x, piece.y), radius)
+    if piece.king:
+        # Draw a crown symbol
+        pygame.draw.circle(win, CROWN, (piece.x, piece.y), radius // 2)
 
-    def _traverse_right(self, start, stop, step, color, right, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if right >= COLS:
-                break
-
-            current = self.board[r][right]
-            if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r, right)] = last + skipped
-                else:
-                    moves[(r, right)] = last
-
-                if last:
-                    if step == -1:
-                        row = max(r - 3, 0)
-                    else:
-                        row = min(r + 3, ROWS)
-                    moves.update(self._traverse_left(r + step, row, step, color, right - 1, skipped=last))
-                    moves.update(self._traverse_right(r + step, row, step, color, right + 1, skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
-
-            right += 1
-
-        return moves
-
-    def remove(self, pieces):
-        for piece in pieces:
-            self.board[piece.row][piece.col] = 0
-            if piece.color == RED:
-                self.red_left -= 1
-            else:
-                self.white_left -= 1
-
-    def winner(self):
-        if self.red_left <= 0:
-            return WHITE
-        elif self.white_left <= 0:
-            return RED
-        return None
-
-    def serialize(self):
-        # Convert board to serializable format
-        serialized = []
-        for row in range(ROWS):
-            serialized_row = []
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece == 0:
-                    serialized_row.append(None)
-                else:
-                    serialized_row.append({
-                        'color': piece.color,
-                        'king': piece.king,
-                        'row': piece.row,
-                        'col': piece.col
-                    })
-            serialized.append(serialized_row)
-        return serialized
-
-    def deserialize(self, data):
-        # Recreate board from serialized data
-        self.board = []
-        self.red_left = self.white_left = 0
-        self.red_kings = self.white_kings = 0
-        
-        for row in range(ROWS):
-            self.board.append([])
-            for col in range(COLS):
-                piece_data = data[row][col]
-                if piece_data is None:
-                    self.board[row].append(0)
-                else:
-                    color = tuple(piece_data['color']) if isinstance(piece_data['color'], list) else piece_data['color']
-                    piece = Piece(row, col, color)
-                    if piece_data['king']:
-                        piece.make_king()
-                        if color == RED:
-                            self.red_kings += 1
-                        else:
-                            self.white_kings += 1
-                    self.board[row].append(piece)
-                    
-                    if color == RED:
-                        self.red_left += 1
-                    else:
-                        self.white_left += 1
+def draw_squares(win):
+    win.fill(BLACK)
+    for row in range(ROWS):
+        for col in range(row % 2, COLS, 2):
+            pygame.draw.rect(win, RED, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+
+def draw_board(win, board):
+    draw_squares(win)
+    for row in range(ROWS):
+        for col in range(COLS):
+            piece = board.board[row][col]
+            if piece != 0:
+                draw_piece(win, piece)
 
 class Network:
     def __init__(self):
@@ -263,17 +54,19 @@ class Network:
         self.addr = (self.server, self.port)
         self.id = None
         self.connected = False
+        self.lock = threading.Lock()  # One request/response on the socket at a time
+        self.outbox = queue.Queue()
+        self.sender = None
 
     def connect(self):
         try:
             self.client.connect(self.addr)
             self.connected = True
             # Receive initial connection message
-            message_header = self.client.recv(HEADER_SIZE).decode()
-            if message_header:
-                message_length = int(message_header.strip())
-                message_data = self.client.recv(message_length).decode()
-                return json.loads(message_data)
+            response = recv_message(self.client)
+            # Ask for compressed board states
+            self.send({'type': 'hello', 'compression': CODECS})
+            return response
         except Exception as e:
             print(f"Connection error: {e}")
             self.connected = False
@@ -284,23 +77,33 @@ class Network:
             if not self.connected:
                 return None
                 
-            # Serialize data to JSON string
-            json_data = json.dumps(data)
-            # Add header with message length
-            message = f"{len(json_data):<{HEADER_SIZE}}" + json_data
-            self.client.send(message.encode())
-            
-            # Receive response
-            response_header = self.client.recv(HEADER_SIZE).decode()
-            if response_header:
-                response_length = int(response_header.strip())
-                response_data = self.client.recv(response_length).decode()
-                return json.loads(response_data)
+            with self.lock:
+                # Serialize data to JSON string
+                json_data = json.dumps(data)
+                # Add header with message length
+                message = f"{len(json_data):<{HEADER_SIZE}}" + json_data
+                self.client.send(message.encode())
+                
+                # Receive response
+                return recv_message(self.client)
         except socket.error as e:
             print(f"Send error: {e}")
             self.connected = False
             return None
 
+    def send_async(self, data, callback):
+        # Hand the request to the sender thread; callback gets the response
+        if self.sender is None:
+            self.sender = threading.Thread(target=self._send_loop)
+            self.sender.daemon = True
+            self.sender.start()
+        self.outbox.put((data, callback))
+
+    def _send_loop(self):
+        while True:
+            data, callback = self.outbox.get()
+            callback(self.send(data))
+
 class Game:
     def __init__(self, win, network):
         self._init()
@@ -314,11 +117,22 @@ class Game:
         self.board = Board()
         self.turn = RED
         self.valid_moves = {}
+        self.replay = History(Board())
+        self.reviewing = False
+        self.moves_requested = False  # A get_moves request for the replay is in flight
+        self.move_seq = 0
+        self.confirmed_seq = 0  # Highest move seq the server has confirmed
+        self.pending_moves = []   # [seq, from, to, captured, undo record] shown but not confirmed
+        self.inbox = queue.Queue()  # Server replies, handled on the render thread
 
     def update(self):
-        self.board.draw(self.win)
-        self.draw_valid_moves(self.valid_moves)
-        self.draw_game_info()
+        if self.reviewing:
+            draw_board(self.win, self.replay.board)
+            self.draw_review_info()
+        else:
+            draw_board(self.win, self.board)
+            self.draw_valid_moves(self.valid_moves)
+            self.draw_game_info()
         pygame.display.update()
 
     def reset(self):
@@ -342,23 +156,113 @@ class Game:
     def _move(self, row, col):
         piece = self.board.get_piece(row, col)
         if self.selected and piece == 0 and (row, col) in self.valid_moves:
-            # Send move to server
+            skipped = self.valid_moves[(row, col)]
+            self.move_seq += 1
             move_data = {
                 'type': 'move',
+                'seq': self.move_seq,
                 'from': (self.selected.row, self.selected.col),
-                'to': (row, col)
+                'to': (row, col),
+                'captured': [(p.row, p.col) for p in skipped]
             }
             
-            response = self.network.send(move_data)
-            if response and response.get('status') == 'success':
-                self.board.move(self.selected, row, col)
-                skipped = self.valid_moves[(row, col)]
-                if skipped:
-                    self.board.remove(skipped)
-                self.change_turn()
-                return True
+            # Show the move straight away; the server's reply confirms it or
+            # rolls it back, so the render loop never waits on the network
+            record = self.board.make_move(self.selected, row, col, skipped)
+            self.pending_moves.append([self.move_seq, move_data['from'], move_data['to'], move_data['captured'], record])
+            self.change_turn()
+            self.network.send_async(move_data, lambda response: self.inbox.put(('move', response)))
+            return True
         return False
 
+    def process_replies(self):
+        while True:
+            try:
+                kind, response = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'move':
+                self.confirm_move(response)
+            elif kind == 'state':
+                self.apply_state(response)
+            elif kind == 'moves':
+                self.add_replay_moves(response)
+
+    def confirm_move(self, response):
+        if response and response.get('status') == 'success':
+            self.confirmed_seq = max(self.confirmed_seq, response['seq'])
+            self.pending_moves = [m for m in self.pending_moves if m[0] > response['seq']]
+            return
+        
+        # Rejected or lost: take back that move and anything played after it
+        seq = response.get('seq') if response else None
+        if response:
+            print(f"Move rejected: {response.get('message')}")
+        while self.pending_moves and (seq is None or self.pending_moves[-1][0] >= seq):
+            self.board.unmake_move(self.pending_moves.pop()[4])
+            self.change_turn()
+
+    def apply_state(self, response):
+        if response.get('type') == 'game_state':
+            # A poll answered before our last confirmed move reached the
+            # server can be handled after the confirmation; it would undo
+            # that move until the next poll, so skip it
+            if response.get('seq', 0) < self.confirmed_seq:
+                return
+            
+            # Update board
+            self.board.deserialize(response['board'])
+            self.turn = tuple(response['turn']) if isinstance(response['turn'], list) else response['turn']
+            self.connected = True
+            
+            # Play our unconfirmed moves again on top of the server's state
+            acked = response.get('seq', 0)
+            self.pending_moves = [m for m in self.pending_moves if m[0] > acked]
+            for i, (seq, from_square, to_square, captured, _) in enumerate(self.pending_moves):
+                piece = self.board.get_piece(*from_square)
+                skipped = [self.board.get_piece(*square) for square in captured]
+                if piece == 0 or any(p == 0 for p in skipped):
+                    # The server's board no longer allows it; its reply will reject it
+                    del self.pending_moves[i:]
+                    break
+                self.pending_moves[i][4] = self.board.make_move(piece, *to_square, skipped)
+                self.turn = WHITE if self.turn == RED else RED
+        
+        elif response.get('type') == 'player_assignment':
+            self.player_color = tuple(response['color']) if isinstance(response['color'], list) else response['color']
+            self.connected = True
+
+    def review(self, step):
+        # Scrub through the game on a separate replay board while the live
+        # board keeps following the server
+        if not self.reviewing:
+            # Moves we have not seen yet are appended when the reply arrives
+            if not self.moves_requested:
+                self.moves_requested = True
+                request = {'type': 'get_moves', 'since': len(self.replay)}
+                self.network.send_async(request, lambda response: self.inbox.put(('moves', response)))
+            self.replay.seek(len(self.replay))
+            self.reviewing = True
+
+        self.replay.seek(self.replay.position() + step)
+        if step > 0 and self.replay.position() == len(self.replay):
+            self.reviewing = False
+
+    def add_replay_moves(self, response):
+        self.moves_requested = False
+        if not response or response.get('type') != 'moves' or response.get('since') != len(self.replay):
+            return
+        for move in response['moves']:
+            try:
+                self.replay.push(move['from'], move['to'], move['captured'])
+            except (KeyError, TypeError, ValueError) as e:
+                # Later moves build on this one, so stop rather than skip it
+                print(f"Bad move in game log: {e}")
+                break
+
+    def stop_review(self):
+        self.reviewing = False
+
     def draw_valid_moves(self, moves):
         for move in moves:
             row, col = move
@@ -384,6 +288,12 @@ class Game:
         status_surface = font.render(status_text, True, status_color)
         self.win.blit(status_surface, (10, 70))
 
+    def draw_review_info(self):
+        font = pygame.font.SysFont('Arial', 24)
+        review_text = f"Reviewing move {self.replay.position()}/{len(self.replay)} - LEFT/RIGHT to scrub, ESC to return"
+        review_surface = font.render(review_text, True, GREEN)
+        self.win.blit(review_surface, (10, 10))
+
     def change_turn(self):
         self.valid_moves = {}
         self.selected = None
@@ -400,15 +310,8 @@ class Game:
                 response = self.network.send(request)
                 
                 if response:
-                    if response.get('type') == 'game_state':
-                        # Update board
-                        self.board.deserialize(response['board'])
-                        self.turn = tuple(response['turn']) if isinstance(response['turn'], list) else response['turn']
-                        self.connected = True
-                    
-                    elif response.get('type') == 'player_assignment':
-                        self.player_color = tuple(response['color']) if isinstance(response['color'], list) else response['color']
-                        self.connected = True
+                    # Applied by the render thread, which owns the board
+                    self.inbox.put(('state', response))
                 
                 time.sleep(0.5)  # Poll every 0.5 seconds
                 
@@ -511,12 +414,19 @@ def get_ip_input(win):
         
         pygame.display.update()
 
-def start_server():
+def start_server(ready=None, failed=None):
     """Start the checkers server in a separate thread"""
     import server
-    server.start_server()
+    server.start_server(ready=ready, failed=failed)
+
+def init_pygame():
+    # Only the subsystems the client uses; pygame.init() would also start
+    # audio, joystick and the rest
+    pygame.display.init()
+    pygame.font.init()
 
 def main():
+    init_pygame()
     win = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption('Checkers - LAN Multiplayer')
     
@@ -541,12 +451,20 @@ def main():
                     local_ip = get_local_ip()
                     
                     # Start server in a separate thread
-                    server_thread = threading.Thread(target=start_server)
+                    server_ready = threading.Event()
+                    server_failed = threading.Event()
+                    server_thread = threading.Thread(target=start_server, args=(server_ready, server_failed))
                     server_thread.daemon = True
                     server_thread.start()
                     
-                    # Wait a moment for server to start
-                    time.sleep(1)
+                    # Wait until the server is listening or has given up
+                    deadline = time.monotonic() + SERVER_START_TIMEOUT
+                    while not server_ready.wait(0.05) and not server_failed.is_set() and time.monotonic() < deadline:
+                        pass
+                    if not server_ready.is_set():
+                        # Connecting now could reach whatever else holds the port
+                        print("Could not start the server")
+                        continue
                     
                     draw_waiting_screen(win, is_host=True, ip=local_ip)
                     
@@ -556,6 +474,7 @@ def main():
                     
                     if response and network.connected:
                         game = Game(win, network)
+                        game.apply_state(response)
                         
                         # Wait for another player to connect
                         waiting = True
@@ -592,6 +511,7 @@ def main():
                     response = network.connect()
                     if response and network.connected:
                         game = Game(win, network)
+                        game.apply_state(response)
                         menu = False
                     else:
                         print("Failed to connect to server")
@@ -632,12 +552,21 @@ def main():
                 if event.type == pygame.QUIT:
                     running = False
                 
-                if event.type == pygame.MOUSEBUTTONDOWN and game.connected:
+                if event.type == pygame.KEYDOWN and game.connected:
+                    if event.key == pygame.K_LEFT:
+                        game.review(-1)
+                    elif event.key == pygame.K_RIGHT:
+                        game.review(1)
+                    elif event.key == pygame.K_ESCAPE:
+                        game.stop_review()
+                
+                if event.type == pygame.MOUSEBUTTONDOWN and game.connected and not game.reviewing:
                     pos = pygame.mouse.get_pos()
                     col, row = pos[0] // SQUARE_SIZE, pos[1] // SQUARE_SIZE
                     if 0 <= row < ROWS and 0 <= col < COLS:
                         game.select(row, col)
             
+            game.process_replies()
             game.update()
             
             # Check for winner
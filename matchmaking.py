@@ -0,0 +1,225 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Rating settings
+DEFAULT_RATING = 1200
+K_FACTOR = 32
+BUCKET_WIDTH = 50       # Rating points covered by one bucket
+MAX_BUCKET_GAP = 4      # Furthest bucket distance allowed when pairing
+GAP_WIDEN_SECONDS = 10  # Each this long in the queue lets a ticket pair one bucket further
+WAIT_SAMPLES = 10000    # Queue-wait samples kept for metrics
+RATINGS_FILE = "ratings.json"
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+def update_ratings(rating_a, rating_b, score_a, k=K_FACTOR):
+    # score_a is 1 for a win by A, 0.5 for a draw and 0 for a loss
+    expected_a = expected_score(rating_a, rating_b)
+    delta = k * (score_a - expected_a)
+    return rating_a + delta, rating_b - delta
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+class RatingStore:
+    def __init__(self, path=RATINGS_FILE):
+        self.path = path
+        self.ratings = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.ratings = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Could not load ratings from {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        # Write to a temporary file first so a crash never leaves half a file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.ratings, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name):
+        with self.lock:
+            return self.ratings.get(name, DEFAULT_RATING)
+
+    def record_result(self, winner, loser, draw=False):
+        with self.lock:
+            rating_w = self.ratings.get(winner, DEFAULT_RATING)
+            rating_l = self.ratings.get(loser, DEFAULT_RATING)
+            rating_w, rating_l = update_ratings(rating_w, rating_l, 0.5 if draw else 1)
+            self.ratings[winner] = round(rating_w, 1)
+            self.ratings[loser] = round(rating_l, 1)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save ratings to {self.path}: {e}")
+            return self.ratings[winner], self.ratings[loser]
+
+class Matchmaker:
+    # Waiting tickets live in one FIFO per rating bucket, and the indexes of
+    # the non-empty buckets are kept sorted so the nearest opponent is found
+    # with a binary search instead of a scan over everyone in the queue
+    def __init__(self, bucket_width=BUCKET_WIDTH, max_gap=MAX_BUCKET_GAP, widen_seconds=GAP_WIDEN_SECONDS):
+        self.bucket_width = bucket_width
+        self.max_gap = max_gap
+        self.widen_seconds = widen_seconds
+        self.buckets = {}   # bucket index -> deque of tickets
+        self.active = []    # sorted indexes of non-empty buckets
+        self.tickets = {}   # key -> waiting ticket
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.enqueued = 0
+        self.paired = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def _bucket(self, rating):
+        return int(rating // self.bucket_width)
+
+    def enqueue(self, key, rating, payload=None):
+        # Returns (waiting_ticket, new_ticket) when a pair is formed, else None
+        ticket = {
+            'key': key,
+            'rating': rating,
+            'payload': payload,
+            'joined': time.monotonic(),
+            'cancelled': False
+        }
+        index = self._bucket(rating)
+
+        with self.lock:
+            if key in self.tickets:
+                return None
+            self.enqueued += 1
+
+            partner = self._pop_nearest(index)
+            if partner is None:
+                queue = self.buckets.get(index)
+                if not queue:
+                    queue = self.buckets[index] = deque()
+                    bisect.insort(self.active, index)
+                queue.append(ticket)
+                self.tickets[key] = ticket
+                return None
+
+            self.paired += 1
+            self.waits.append(ticket['joined'] - partner['joined'])
+            return partner, ticket
+
+    def cancel(self, key):
+        # Cancelled tickets are skipped lazily when their bucket is next
+        # popped, but a bucket left holding only cancelled tickets is freed
+        # straight away so a burst of joins and disconnects does not linger
+        with self.lock:
+            ticket = self.tickets.pop(key, None)
+            if ticket is None:
+                return False
+            ticket['cancelled'] = True
+            self.cancelled += 1
+
+            index = self._bucket(ticket['rating'])
+            queue = self.buckets.get(index)
+            if queue is not None and all(t['cancelled'] for t in queue):
+                del self.buckets[index]
+                self.active.pop(bisect.bisect_left(self.active, index))
+            return True
+
+    def _gap(self, ticket, now):
+        # The longer a ticket has waited the wider the rating gap it accepts
+        return self.max_gap + int((now - ticket['joined']) // self.widen_seconds)
+
+    def _pop_nearest(self, index, min_gap=0):
+        # A candidate is close enough when it is within its own widened gap
+        # or within min_gap, the gap of the ticket looking for a partner
+        now = time.monotonic()
+        while self.active:
+            pos = bisect.bisect_left(self.active, index)
+            candidates = []
+            if pos < len(self.active):
+                candidates.append(self.active[pos])
+            if pos > 0:
+                candidates.append(self.active[pos - 1])
+            candidates = [c for c in candidates if abs(c - index) <= max(min_gap, self._gap(self.buckets[c][0], now))]
+            if not candidates:
+                return None
+
+            # Prefer the closest bucket, then whoever has waited longest
+            best = min(candidates, key=lambda c: (abs(c - index), self.buckets[c][0]['joined']))
+            queue = self.buckets[best]
+            ticket = queue.popleft()
+            if not queue:
+                del self.buckets[best]
+                self.active.pop(bisect.bisect_left(self.active, best))
+            if ticket['cancelled']:
+                continue
+            del self.tickets[ticket['key']]
+            return ticket
+        return None
+
+    def rematch(self):
+        # Pairs tickets that are both already waiting once their widened
+        # gaps reach each other; enqueue only looks from the new ticket.
+        # Returns a list of (older, newer) ticket pairs.
+        pairs = []
+        with self.lock:
+            now = time.monotonic()
+            for ticket in sorted(self.tickets.values(), key=lambda t: t['joined']):
+                if self.tickets.get(ticket['key']) is not ticket:
+                    continue  # Paired earlier in this pass
+
+                # Take the ticket out of its bucket so it cannot pair with itself
+                index = self._bucket(ticket['rating'])
+                queue = self.buckets[index]
+                queue.remove(ticket)
+                if not queue:
+                    del self.buckets[index]
+                    self.active.pop(bisect.bisect_left(self.active, index))
+                del self.tickets[ticket['key']]
+
+                partner = self._pop_nearest(index, self._gap(ticket, now))
+                if partner is None:
+                    # Back in the bucket; it is the oldest there, so it goes in front
+                    queue = self.buckets.get(index)
+                    if not queue:
+                        queue = self.buckets[index] = deque()
+                        bisect.insort(self.active, index)
+                    queue.appendleft(ticket)
+                    self.tickets[ticket['key']] = ticket
+                    continue
+
+                self.paired += 1
+                self.waits.append(now - ticket['joined'])
+                pairs.append((ticket, partner) if ticket['joined'] <= partner['joined'] else (partner, ticket))
+        return pairs
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            queued = len(self.tickets)
+            now = time.monotonic()
+            oldest = max((now - t['joined'] for t in self.tickets.values()), default=0.0)
+            return {
+                'queued': queued,
+                'enqueued': self.enqueued,
+                'paired': self.paired,
+                'cancelled': self.cancelled,
+                'wait_p50': percentile(waits, 0.50),
+                'wait_p95': percentile(waits, 0.95),
+                'wait_p99': percentile(waits, 0.99),
+                'wait_max': waits[-1] if waits else 0.0,
+                'oldest_wait': oldest
+            }
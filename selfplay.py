@@ -0,0 +1,232 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from board import Board, RED, WHITE
+from engine import best_move, evaluate, get_all_moves, other_color, DEFAULT_WEIGHTS
+
+# Self-play settings
+DEFAULT_SELFPLAY_DEPTH = 3
+MAX_PLIES = 150            # Games still going after this many plies are adjudicated
+ADJUDICATE_MARGIN = 2.0    # Material lead, in men, that wins an adjudicated game
+OPENING_PLIES = 2
+RANDOM_PLIES = 4           # Seeded random plies after each opening so games do not repeat
+RESULTS_FILE = "selfplay_results.jsonl"
+
+def generate_openings(plies=OPENING_PLIES):
+    # Every legal sequence of the first plies, as [from, to, captured] moves
+    openings = [[]]
+    for _ in range(plies):
+        extended = []
+        for opening in openings:
+            board, turn = play_opening(opening)
+            for piece, (row, col), skipped in get_all_moves(board, turn):
+                move = [(piece.row, piece.col), (row, col), [(p.row, p.col) for p in skipped]]
+                extended.append(opening + [move])
+        openings = extended
+    return openings
+
+def play_opening(opening):
+    board = Board()
+    turn = RED
+    for from_square, to_square, captured in opening:
+        piece = board.get_piece(*from_square)
+        board.make_move(piece, *to_square, [board.get_piece(*square) for square in captured])
+        turn = other_color(turn)
+    return board, turn
+
+def play_random_plies(board, turn, plies, seed):
+    # The engines are deterministic, so these moves are what makes one
+    # game on an opening differ from the next
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(plies):
+        legal = get_all_moves(board, turn)
+        if not legal:
+            break
+        piece, (row, col), skipped = rng.choice(legal)
+        moves.append([(piece.row, piece.col), (row, col), [(p.row, p.col) for p in skipped]])
+        board.make_move(piece, row, col, skipped)
+        turn = other_color(turn)
+    return moves, turn
+
+def play_game(task):
+    # Runs in a worker process. Engine A plays RED when a_is_red is set.
+    game_index, opening_index, opening, random_plies, seed, a_is_red, engine_a, engine_b = task
+    board, turn = play_opening(opening)
+    extra, turn = play_random_plies(board, turn, random_plies, seed)
+    engines = {RED: engine_a, WHITE: engine_b} if a_is_red else {RED: engine_b, WHITE: engine_a}
+
+    move_times = []  # Microseconds per engine move
+    winner = None
+    adjudicated = False
+    plies = len(opening) + len(extra)
+    while True:
+        if board.red_left <= 0 or board.white_left <= 0:
+            winner = RED if board.white_left <= 0 else WHITE
+            break
+        if plies >= MAX_PLIES:
+            # Still going: a clear material lead wins, anything less is a draw
+            adjudicated = True
+            material = evaluate(board, RED)
+            if material >= ADJUDICATE_MARGIN:
+                winner = RED
+            elif material <= -ADJUDICATE_MARGIN:
+                winner = WHITE
+            break
+        engine = engines[turn]
+        start = time.perf_counter()
+        move, _ = best_move(board, turn, engine['depth'], tuple(engine['weights']))
+        move_times.append(round((time.perf_counter() - start) * 1e6))
+        if move is None:
+            # No legal moves loses the game
+            winner = other_color(turn)
+            break
+        from_square, to_square, captured = move
+        board.make_move(board.get_piece(*from_square), *to_square, [board.get_piece(*square) for square in captured])
+        turn = other_color(turn)
+        plies += 1
+
+    if winner is None:
+        score_a = 0.5
+    else:
+        score_a = 1.0 if (winner == RED) == a_is_red else 0.0
+    return {
+        'game': game_index,
+        'opening': opening_index,
+        'extra': extra,
+        'a_red': a_is_red,
+        'score_a': score_a,
+        'plies': plies,
+        'adjudicated': adjudicated,
+        'move_us': move_times
+    }
+
+def elo_difference(wins, draws, losses, z=1.96):
+    # Elo difference of A over B with a confidence interval from the
+    # per-game score variance (z = 1.96 gives 95%)
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, (-math.inf, math.inf)
+    score = (wins + 0.5 * draws) / games
+
+    def to_elo(s):
+        # A score of 0 or 1 has no finite Elo difference
+        if s <= 0:
+            return -math.inf
+        if s >= 1:
+            return math.inf
+        return -400 * math.log10(1 / s - 1)
+
+    # A clean sweep has zero variance, which would give a zero-width
+    # interval; bound it on the finite side with the Wilson interval instead
+    if score == 1:
+        return math.inf, (to_elo(games / (games + z * z)), math.inf)
+    if score == 0:
+        return -math.inf, (-math.inf, to_elo(z * z / (games + z * z)))
+
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = z * math.sqrt(variance / games)
+    return to_elo(score), (to_elo(score - margin), to_elo(score + margin))
+
+def run_tournament(games, engine_a, engine_b, openings, workers=None, out=RESULTS_FILE,
+                   random_plies=RANDOM_PLIES, seed=0):
+    workers = workers or os.cpu_count() or 1
+    cores = min(workers, os.cpu_count() or workers)  # Extra workers share cores, they do not add any
+    # Each start position is played twice with colors swapped so neither
+    # side profits from a lopsided opening; both games of a pair share the
+    # seed of their random plies
+    tasks = []
+    for game_index in range(games):
+        pair = game_index // 2
+        opening_index = pair % len(openings)
+        tasks.append((game_index, opening_index, openings[opening_index], random_plies, f"{seed}-{pair}",
+                      game_index % 2 == 0, engine_a, engine_b))
+
+    # Games from the same start position and colors replay move for move,
+    # so only the first of them counts towards the result
+    seen = set()
+    repeated = 0
+    wins = draws = losses = 0
+    adjudicated = 0
+    total_moves = 0
+    total_move_us = 0
+    start = time.perf_counter()
+    with open(out, "w") as f, multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(play_game, tasks, chunksize=max(1, games // (workers * 8))):
+            f.write(json.dumps(result, separators=(',', ':')) + "\n")
+            key = (result['opening'], json.dumps(result['extra']), result['a_red'])
+            if key in seen:
+                repeated += 1
+                continue
+            seen.add(key)
+            if result['score_a'] == 1.0:
+                wins += 1
+            elif result['score_a'] == 0.0:
+                losses += 1
+            else:
+                draws += 1
+            adjudicated += result['adjudicated']
+            total_moves += len(result['move_us'])
+            total_move_us += sum(result['move_us'])
+    elapsed = time.perf_counter() - start
+
+    elo, (low, high) = elo_difference(wins, draws, losses)
+    return {
+        'games': games,
+        'repeated': repeated,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'adjudicated': adjudicated,
+        'elo': elo,
+        'elo_low': low,
+        'elo_high': high,
+        'seconds': elapsed,
+        'games_per_second': games / elapsed,
+        'games_per_second_per_core': games / elapsed / cores,
+        'mean_move_us': total_move_us / total_moves if total_moves else 0.0
+    }
+
+def parse_weights(text):
+    piece_value, king_value = (float(value) for value in text.split(","))
+    return [piece_value, king_value]
+
+if __name__ == "__main__":
+    default_weights = ",".join(str(w) for w in DEFAULT_WEIGHTS)
+    parser = argparse.ArgumentParser(description="Engine-vs-engine self-play tournament")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--depth-a', type=int, default=DEFAULT_SELFPLAY_DEPTH)
+    parser.add_argument('--depth-b', type=int, default=DEFAULT_SELFPLAY_DEPTH)
+    parser.add_argument('--weights-a', type=parse_weights, default=default_weights, help="piece,king values for engine A")
+    parser.add_argument('--weights-b', type=parse_weights, default=default_weights, help="piece,king values for engine B")
+    parser.add_argument('--openings', help="JSON file with a list of openings, each a list of [from, to, captured] moves")
+    parser.add_argument('--opening-plies', type=int, default=OPENING_PLIES, help="plies per generated opening when no file is given")
+    parser.add_argument('--random-plies', type=int, default=RANDOM_PLIES, help="seeded random plies played after each opening")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random plies")
+    parser.add_argument('--out', default=RESULTS_FILE, help="JSON-lines file for per-game results")
+    args = parser.parse_args()
+
+    if args.openings:
+        with open(args.openings) as f:
+            openings = json.load(f)
+    else:
+        openings = generate_openings(args.opening_plies)
+
+    engine_a = {'depth': args.depth_a, 'weights': args.weights_a}
+    engine_b = {'depth': args.depth_b, 'weights': args.weights_b}
+    summary = run_tournament(args.games, engine_a, engine_b, openings, args.workers, args.out,
+                             args.random_plies, args.seed)
+
+    print(f"{summary['games']} games from {len(openings)} openings in {summary['seconds']:.1f}s")
+    if summary['repeated']:
+        print(f"{summary['repeated']} games repeated an earlier game and are left out of the result")
+    print(f"A: +{summary['wins']} ={summary['draws']} -{summary['losses']} ({summary['adjudicated']} adjudicated at {MAX_PLIES} plies)")
+    print(f"Elo A - B: {summary['elo']:+.1f} (95% CI {summary['elo_low']:+.1f} to {summary['elo_high']:+.1f})")
+    print(f"{summary['games_per_second']:.2f} games/s, {summary['games_per_second_per_core']:.2f} games/s per core")
+    print(f"mean engine move time: {summary['mean_move_us'] / 1000:.2f} ms")
@@ -2,39 +2,88 @@ import socket
 import threading
 import json
 import time
+import argparse
+
+from analysis import AnalysisService, HINT_DEPTH, ANALYZE_DEPTH
+from board import Board, ROWS, COLS
+from matchmaking import Matchmaker, RatingStore, RATINGS_FILE
+from transport import Connection, Message, TransportStats
 
 # Network settings
 PORT = 5555
-HEADER_SIZE = 10
+DEFAULT_ROOM = "default"
+FLUSH_INTERVAL = 0.02  # Seconds between flushes of queued broadcasts
+REMATCH_INTERVAL = 1.0  # Seconds between pairing passes over waiting players
+ROOM_GRACE = 60  # Seconds an empty, unfinished room is kept for its players to come back
+
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
 
 class CheckersServer:
-    def __init__(self):
+    def __init__(self, matchmaking=False, ratings_file=RATINGS_FILE, port=PORT):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.host = "0.0.0.0"  # Listen on all interfaces
-        self.port = PORT
+        self.port = port
         self.addr = (self.host, self.port)
         
         self.players = []
-        self.game_state = {
-            'board': None,
-            'turn': (255, 0, 0),  # RED starts
-            'players_connected': 0
-        }
+        self.game_state = self.new_game_state()
+
+        # Matched and room games live alongside the direct-connect game (id 0)
+        self.matchmaking = matchmaking
+        self.matchmaker = Matchmaker()
+        self.ratings = RatingStore(ratings_file)
+        self.games = {0: self.game_state}
+        self.rooms = {}  # room id -> game id
+        self.active_names = {}  # name -> session queued or in an unfinished matched game
+        self.room_closed = None  # Called with the room id whenever a room is removed
+        self.next_game_id = 1
+        self.games_lock = threading.RLock()
+        self.analysis = AnalysisService()
+        
+        # Broadcasts to watchers are queued and written once per tick
+        self.transport_stats = TransportStats()
+        self.dirty = set()  # Connections with queued broadcasts
+        self.dirty_lock = threading.Lock()
+        self.flusher = None
+        self.rematcher = None
         self.initialize_game()
         
+    def new_game_state(self):
+        return {
+            'board': None,
+            'turn': RED,  # RED starts
+            'players_connected': 0,
+            'names': [None, None],
+            'slots': [None, None],
+            'moves': [],
+            'seqs': [0, 0],  # Last move sequence number applied per player
+            'watchers': [],  # Connections receiving every new state
+            'empty_since': None,  # When the last player left a room game
+            'winner': None
+        }
+
     def initialize_game(self):
         # Create initial board state using the same Board class logic
         board = self.create_initial_board()
         self.game_state['board'] = board
         self.game_state['players_connected'] = 0
         
+    def create_game(self, names):
+        game_state = self.new_game_state()
+        game_state['board'] = self.create_initial_board()
+        game_state['players_connected'] = 2 - list(names).count(None)
+        game_state['names'] = list(names)
+        with self.games_lock:
+            game_id = self.next_game_id
+            self.next_game_id += 1
+            self.games[game_id] = game_state
+        return game_id
+        
     def create_initial_board(self):
         # Create the initial board configuration
         board = []
-        RED = (255, 0, 0)
-        WHITE = (255, 255, 255)
-        
         for row in range(8):
             board_row = []
             for col in range(8):
@@ -60,113 +109,495 @@ class CheckersServer:
             board.append(board_row)
         return board
         
-    def handle_client(self, conn, addr, player_id):
+    def handle_client(self, conn, addr, player_id, room=None):
         print(f"New connection from {addr}, player {player_id}")
         
-        # Send player their color assignment
-        color = (255, 0, 0) if player_id == 0 else (255, 255, 255)  # RED or WHITE
-        assignment = {
-            'type': 'player_assignment',
-            'color': color,
-            'player_id': player_id
+        connection = Connection(conn, self.transport_stats)
+        session = {
+            'key': f"{addr[0]}:{addr[1]}",
+            'name': None,
+            'room': None,
+            'player_id': player_id,
+            'game_id': None if player_id is None else 0,
+            'watching': None,
+            'connection': connection
         }
-        self.send(conn, assignment)
+        
+        if room is not None:
+            # Clients handed over without a join message go straight into their room
+            response = self.join_room(room, session)
+            self.send(connection, response)
+            if session['game_id'] is None:
+                conn.close()
+                return
+        elif player_id is None:
+            # Matchmaking and room players get their color once they are paired
+            self.send(connection, {'type': 'welcome', 'matchmaking': self.matchmaking})
+        else:
+            # Send player their color assignment
+            self.send(connection, self.assignment(session))
         
         while True:
             try:
                 # Receive message
-                message_header = conn.recv(HEADER_SIZE)
-                if not message_header:
+                data = connection.recv()
+                if data is None:
                     break
-                    
-                message_length = int(message_header.strip())
-                message_data = conn.recv(message_length).decode()
-                data = json.loads(message_data)
                 
                 # Process message
-                response = self.process_message(data, player_id)
-                if response:
-                    self.send(conn, response)
+                response = self.process_message(data, session)
+                if response and not connection.queue(response):
+                    # Too far behind to take its reply; the client would
+                    # wait for it forever, so disconnect instead
+                    print(f"Client {addr} stopped reading, disconnecting")
+                    break
+                
+                # Answer pipelined requests together in one write
+                if not connection.has_input():
+                    connection.flush()
                     
             except Exception as e:
                 print(f"Error with client {addr}: {e}")
                 break
         
-        # Remove player on disconnect
-        if player_id < len(self.players):
-            self.players[player_id] = None
-        self.game_state['players_connected'] = len([p for p in self.players if p is not None])
-        print(f"Player {player_id} disconnected")
+        self.stop_watching(session)
+        if session['game_id'] == 0:
+            # Remove player on disconnect
+            if player_id < len(self.players):
+                self.players[player_id] = None
+            self.game_state['players_connected'] = len([p for p in self.players if p is not None])
+        else:
+            self.leave_game(session)
+        print(f"Player {session['player_id']} disconnected")
         conn.close()
     
-    def process_message(self, data, player_id):
+    def watch(self, data, session):
+        # Watchers get the current state now and every new state after a move
+        if 'room' in data:
+            game_id = self.rooms.get(str(data['room']))
+        else:
+            game_id = data.get('game_id', 0)
+        game_state = self.games.get(game_id)
+        if game_state is None:
+            return {'status': 'error', 'message': 'No such game'}
+        
+        self.stop_watching(session)
+        with self.games_lock:
+            game_state['watchers'].append(session['connection'])
+        session['watching'] = game_id
+        return self.state_message(game_state)
+    
+    def stop_watching(self, session):
+        game_state = self.games.get(session['watching'])
+        session['watching'] = None
+        if game_state is None:
+            return
+        connection = session['connection']
+        with self.games_lock:
+            if connection in game_state['watchers']:
+                game_state['watchers'].remove(connection)
+        with self.dirty_lock:
+            self.dirty.discard(connection)
+    
+    def broadcast(self, game_state):
+        if not game_state['watchers']:
+            return
+        # Encoded (and compressed) once however many watchers there are
+        message = Message(self.state_message(game_state))
+        with self.games_lock:
+            watchers = list(game_state['watchers'])
+        queued = []
+        for connection in watchers:
+            if connection.queue(message):
+                queued.append(connection)
+            else:
+                self.drop_watcher(game_state, connection)
+        with self.dirty_lock:
+            self.dirty.update(queued)
+        
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self.flush_loop)
+            self.flusher.daemon = True
+            self.flusher.start()
+    
+    def drop_watcher(self, game_state, connection):
+        # A watcher this far behind is not reading; disconnect it rather
+        # than buffer states for it without limit
+        print("Disconnecting a watcher that stopped reading")
+        with self.games_lock:
+            if connection in game_state['watchers']:
+                game_state['watchers'].remove(connection)
+        with self.dirty_lock:
+            self.dirty.discard(connection)
+        connection.shutdown()
+    
+    def flush_loop(self):
+        # Writes never block here, so one slow watcher cannot hold up the rest
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            with self.dirty_lock:
+                dirty = self.dirty
+                self.dirty = set()
+            unfinished = []
+            for connection in dirty:
+                try:
+                    if not connection.flush(blocking=False):
+                        unfinished.append(connection)
+                except OSError as e:
+                    print(f"Error flushing to watcher: {e}")
+            if unfinished:
+                # Whatever the socket did not take goes out on a later tick
+                with self.dirty_lock:
+                    self.dirty.update(unfinished)
+    
+    def state_message(self, game_state):
+        return {
+            'type': 'game_state',
+            'board': game_state['board'],
+            'turn': game_state['turn'],
+            'players_connected': game_state['players_connected'],
+            'winner': game_state['winner']
+        }
+    
+    def assignment(self, session):
+        player_id = session['player_id']
+        return {
+            'type': 'player_assignment',
+            'color': RED if player_id == 0 else WHITE,
+            'player_id': player_id,
+            'game_id': session['game_id']
+        }
+    
+    def join_queue(self, data, session):
+        if not self.matchmaking:
+            return {'status': 'error', 'message': 'Matchmaking is disabled'}
+        self.leave_finished_game(session)
+        if session['game_id'] is not None:
+            return {'status': 'error', 'message': 'Already in a game'}
+        
+        # One session per name, so nobody is paired with themselves or
+        # queues under someone else's name to forfeit their rating away
+        name = str(data.get('name') or session['key'])
+        with self.games_lock:
+            if self.active_names.get(session['name']) is session:
+                return {'status': 'error', 'message': 'Already queued'}
+            if name in self.active_names:
+                return {'status': 'error', 'message': 'Name is already in use'}
+            self.active_names[name] = session
+        session['name'] = name
+        rating = self.ratings.get(session['name'])
+        match = self.matchmaker.enqueue(session['key'], rating, session)
+        if match is None:
+            if self.rematcher is None:
+                self.rematcher = threading.Thread(target=self.rematch_loop)
+                self.rematcher.daemon = True
+                self.rematcher.start()
+            return {'type': 'queued', 'rating': rating}
+        
+        self.start_match(*match)
+        return self.assignment(session)
+    
+    def start_match(self, waiting, joined):
+        # The player who waited longest moves first
+        first, second = waiting['payload'], joined['payload']
+        game_id = self.create_game([first['name'], second['name']])
+        first['player_id'] = 0
+        first['game_id'] = game_id
+        second['player_id'] = 1
+        second['game_id'] = game_id
+        print(f"Paired {first['name']} ({waiting['rating']}) with {second['name']} ({joined['rating']}) in game {game_id}")
+    
+    def rematch_loop(self):
+        # Players already waiting are paired here as their rating gaps widen;
+        # they find out through their next queue_status poll
+        while True:
+            time.sleep(REMATCH_INTERVAL)
+            for waiting, joined in self.matchmaker.rematch():
+                self.start_match(waiting, joined)
+    
+    def join_room(self, room, session):
+        self.leave_finished_game(session)
+        if session['game_id'] is not None:
+            return {'status': 'error', 'message': 'Already in a game'}
+        
+        room = str(room)
+        with self.games_lock:
+            game_id = self.rooms.get(room)
+            if game_id is None:
+                game_id = self.rooms[room] = self.create_game([None, None])
+            game_state = self.games[game_id]
+            
+            slots = game_state['slots']
+            if None not in slots:
+                return {'status': 'error', 'message': 'Room is full'}
+            player_id = slots.index(None)
+            slots[player_id] = session['key']
+            game_state['seqs'][player_id] = 0  # A rejoining client numbers its moves from 1 again
+            game_state['players_connected'] = 2 - slots.count(None)
+        
+        session['room'] = room
+        session['player_id'] = player_id
+        session['game_id'] = game_id
+        print(f"Player {player_id} joined room {room}")
+        return self.assignment(session)
+    
+    def leave_game(self, session):
+        if session['game_id'] is None:
+            self.matchmaker.cancel(session['key'])
+            with self.games_lock:
+                if self.active_names.get(session['name']) is session:
+                    del self.active_names[session['name']]
+            return
+        
+        game_state = self.games.get(session['game_id'])
+        if game_state is None:
+            return
+        
+        if session['room'] is not None:
+            # Room games stay open for a while so a dropped player can
+            # reconnect to their seat
+            with self.games_lock:
+                game_state['slots'][session['player_id']] = None
+                game_state['players_connected'] = 2 - game_state['slots'].count(None)
+                if game_state['players_connected'] == 0:
+                    if game_state['winner'] is not None:
+                        self.close_room(session['room'])
+                    else:
+                        game_state['empty_since'] = time.monotonic()
+                        timer = threading.Timer(ROOM_GRACE, self.expire_room, args=(session['room'], session['game_id']))
+                        timer.daemon = True
+                        timer.start()
+            return
+        
+        # Leaving an unfinished rated game forfeits it; the game is dropped
+        # once both players are gone
+        with self.games_lock:
+            game_state['players_connected'] -= 1
+            if game_state['players_connected'] <= 0:
+                self.games.pop(session['game_id'], None)
+        if game_state['winner'] is None:
+            self.end_game(game_state, WHITE if session['player_id'] == 0 else RED)
+            self.broadcast(game_state)
+    
+    def expire_room(self, room, game_id):
+        with self.games_lock:
+            if self.rooms.get(room) != game_id:
+                return
+            game_state = self.games[game_id]
+            if game_state['players_connected'] > 0:
+                return
+            if time.monotonic() - game_state['empty_since'] < ROOM_GRACE:
+                return  # Emptied again since; a later timer checks it
+            print(f"Room {room} expired")
+            self.close_room(room)
+    
+    def close_room(self, room):
+        with self.games_lock:
+            game_id = self.rooms.pop(room)
+            self.games.pop(game_id, None)
+        if self.room_closed is not None:
+            self.room_closed(room)
+    
+    def leave_finished_game(self, session):
+        # Players stay in a finished game so they can still read the result,
+        # until they queue or join a room again
+        if session['game_id'] in (None, 0):
+            return
+        game_state = self.games.get(session['game_id'])
+        if game_state is not None and game_state['winner'] is None:
+            return
+        self.leave_game(session)
+        session['room'] = None
+        session['player_id'] = None
+        session['game_id'] = None
+    
+    def end_game(self, game_state, winner):
+        with self.games_lock:
+            if game_state['winner'] is not None:
+                return
+            game_state['winner'] = winner
+            for name in game_state['names']:
+                self.active_names.pop(name, None)
+        
+        # Write rating changes back for matched games
+        names = game_state['names']
+        if None in names:
+            return
+        winner_id = 0 if winner == RED else 1
+        new_ratings = self.ratings.record_result(names[winner_id], names[1 - winner_id])
+        print(f"{names[winner_id]} beat {names[1 - winner_id]}, new ratings: {new_ratings}")
+    
+    def process_message(self, data, session):
         message_type = data.get('type')
         
+        if message_type == 'queue':
+            return self.join_queue(data, session)
+        
+        elif message_type == 'join':
+            return self.join_room(data.get('room', DEFAULT_ROOM), session)
+        
+        elif message_type == 'queue_status':
+            if session['game_id'] is None:
+                return {'type': 'queued', 'rating': self.ratings.get(session['name'])}
+            return self.assignment(session)
+        
+        elif message_type == 'queue_stats':
+            stats = self.matchmaker.stats()
+            stats['type'] = 'queue_stats'
+            return stats
+        
+        elif message_type == 'hello':
+            codec = session['connection'].negotiate(data.get('compression'))
+            return {'type': 'hello', 'compression': codec}
+        
+        elif message_type == 'watch':
+            return self.watch(data, session)
+        
+        elif message_type == 'transport_stats':
+            stats = self.transport_stats.snapshot()
+            stats['type'] = 'transport_stats'
+            return stats
+        
+        elif message_type == 'analysis_stats':
+            stats = self.analysis.stats()
+            stats['type'] = 'analysis_stats'
+            return stats
+        
+        game_state = self.games.get(session['game_id'])
+        if game_state is None:
+            return {'status': 'error', 'message': 'Not in a game'}
+        player_id = session['player_id']
+        
         if message_type == 'get_state':
-            return {
-                'type': 'game_state',
-                'board': self.game_state['board'],
-                'turn': self.game_state['turn'],
-                'players_connected': self.game_state['players_connected']
-            }
+            response = self.state_message(game_state)
+            response['seq'] = game_state['seqs'][player_id]
+            return response
             
         elif message_type == 'move':
-            # Verify it's this player's turn
-            current_player_color = (255, 0, 0) if player_id == 0 else (255, 255, 255)
-            if self.game_state['turn'] != current_player_color:
-                return {'status': 'error', 'message': 'Not your turn'}
-            
-            # Process the move
-            from_row, from_col = data['from']
-            to_row, to_col = data['to']
-            
-            # Update the board state
-            board = self.game_state['board']
-            
-            # Get the piece being moved
-            piece_data = board[from_row][from_col]
-            if not piece_data or piece_data['color'] != current_player_color:
-                return {'status': 'error', 'message': 'Invalid piece'}
-            
-            # Move the piece
-            board[to_row][to_col] = {
-                'color': piece_data['color'],
-                'king': piece_data['king'],
-                'row': to_row,
-                'col': to_col
-            }
-            board[from_row][from_col] = None
-            
-            # Check for king promotion
-            if (current_player_color == (255, 0, 0) and to_row == 0) or \
-               (current_player_color == (255, 255, 255) and to_row == 7):
-                board[to_row][to_col]['king'] = True
-            
-            # Update turn
-            self.game_state['turn'] = (255, 255, 255) if self.game_state['turn'] == (255, 0, 0) else (255, 0, 0)
-            
-            return {'status': 'success'}
+            response = self.apply_move(game_state, player_id, data)
+            # Echo the client's sequence number so it can match the reply to
+            # the move it already shows; get_state reports the last one applied
+            seq = data.get('seq')
+            if seq is not None and response['status'] == 'success':
+                game_state['seqs'][player_id] = seq
+            response['seq'] = seq
+            if response['status'] == 'success':
+                self.broadcast(game_state)
+            return response
+        
+        elif message_type in ('hint', 'analyze'):
+            # Searches run in the background; ask again while 'pending'
+            depth = HINT_DEPTH if message_type == 'hint' else ANALYZE_DEPTH
+            status, result = self.analysis.request(game_state['board'], game_state['turn'], depth)
+            if result is None:
+                # 'busy' means the search pool is full; try again later
+                return {'type': message_type, 'status': status}
+            response = dict(result)
+            response['type'] = message_type
+            response['status'] = status
+            return response
+        
+        elif message_type == 'get_moves':
+            # Move log for replaying the game, from move number 'since' on
+            try:
+                since = int(data.get('since', 0))
+            except (TypeError, ValueError):
+                since = -1
+            if since < 0:
+                return {'status': 'error', 'message': 'Invalid move number'}
+            return {'type': 'moves', 'since': since, 'moves': game_state['moves'][since:]}
         
         return {'status': 'unknown_command'}
     
-    def send(self, conn, data):
+    def apply_move(self, game_state, player_id, data):
+        if game_state['winner'] is not None:
+            return {'status': 'error', 'message': 'Game is over'}
+        
+        # Verify it's this player's turn
+        current_player_color = RED if player_id == 0 else WHITE
+        if game_state['turn'] != current_player_color:
+            return {'status': 'error', 'message': 'Not your turn'}
+        
+        # Process the move
+        try:
+            from_row, from_col = (int(v) for v in data['from'])
+            to_row, to_col = (int(v) for v in data['to'])
+            captured = sorted((int(row), int(col)) for row, col in data.get('captured', []))
+        except (KeyError, TypeError, ValueError):
+            return {'status': 'error', 'message': 'Malformed move'}
+        squares = [(from_row, from_col), (to_row, to_col)] + captured
+        if not all(0 <= row < ROWS and 0 <= col < COLS for row, col in squares):
+            return {'status': 'error', 'message': 'Invalid move'}
+        
+        board = game_state['board']
+        
+        # Get the piece being moved
+        piece_data = board[from_row][from_col]
+        if not piece_data or piece_data['color'] != current_player_color:
+            return {'status': 'error', 'message': 'Invalid piece'}
+        
+        # Check the move against the rules before touching the state: the
+        # destination must be reachable and the jumped squares must match
+        rules = Board()
+        rules.deserialize(board)
+        skipped = rules.get_valid_moves(rules.get_piece(from_row, from_col)).get((to_row, to_col))
+        if skipped is None or sorted((p.row, p.col) for p in skipped) != captured:
+            return {'status': 'error', 'message': 'Invalid move'}
+        
+        # Move the piece
+        board[to_row][to_col] = {
+            'color': piece_data['color'],
+            'king': piece_data['king'],
+            'row': to_row,
+            'col': to_col
+        }
+        board[from_row][from_col] = None
+        
+        # Remove any pieces jumped on the way
+        for row, col in captured:
+            board[row][col] = None
+        game_state['moves'].append({'from': (from_row, from_col), 'to': (to_row, to_col), 'captured': captured})
+        
+        # Check for king promotion
+        if (current_player_color == RED and to_row == 0) or \
+           (current_player_color == WHITE and to_row == 7):
+            board[to_row][to_col]['king'] = True
+        
+        # Update turn
+        game_state['turn'] = WHITE if game_state['turn'] == RED else RED
+        
+        # The game ends when the opponent has no pieces left
+        opponent_color = game_state['turn']
+        if not any(p and p['color'] == opponent_color for board_row in board for p in board_row):
+            self.end_game(game_state, current_player_color)
+        
+        return {'status': 'success'}
+    
+    def send(self, connection, data):
         try:
-            json_data = json.dumps(data)
-            message = f"{len(json_data):<{HEADER_SIZE}}" + json_data
-            conn.send(message.encode())
+            connection.send(data)
         except Exception as e:
             print(f"Error sending data: {e}")
     
-    def start(self):
+    def start(self, ready=None, failed=None):
         try:
             self.server.bind(self.addr)
-            self.server.listen(2)  # Allow 2 players
+            self.server.listen(128 if self.matchmaking else 2)  # Allow 2 players unless queueing
             print(f"Checkers server started on {self.host}:{self.port}")
             print("Waiting for connections...")
+            if ready is not None:
+                ready.set()
             
             while True:
                 conn, addr = self.server.accept()
                 
+                if self.matchmaking:
+                    # Every connection is accepted and waits in the queue
+                    thread = threading.Thread(target=self.handle_client, args=(conn, addr, None))
+                    thread.daemon = True
+                    thread.start()
+                    continue
+                
                 # Assign player ID
                 player_id = None
                 for i in range(2):
@@ -175,6 +606,7 @@ class CheckersServer:
                     if self.players[i] is None:
                         player_id = i
                         self.players[i] = conn
+                        self.game_state['seqs'][i] = 0  # A reconnecting client numbers its moves from 1 again
                         break
                 
                 if player_id is not None:
@@ -193,12 +625,48 @@ class CheckersServer:
                     
         except Exception as e:
             print(f"Server error: {e}")
+            if failed is not None:
+                failed.set()
         finally:
             self.server.close()
 
-def start_server():
-    server = CheckersServer()
-    server.start()
+    def serve_channel(self, channel):
+        # Worker mode: the front acceptor owns the listening port and hands
+        # accepted connections over the channel together with their room
+        self.server.close()
+        self.room_closed = lambda room: self.notify_room_closed(channel, room)
+        while True:
+            message, fds, _, _ = socket.recv_fds(channel, 1024, 1)
+            if not fds:
+                break
+            handoff = json.loads(message)
+            conn = socket.socket(fileno=fds[0])
+            thread = threading.Thread(target=self.handle_client, args=(conn, tuple(handoff['addr']), None, handoff['room']))
+            thread.daemon = True
+            thread.start()
+
+    def notify_room_closed(self, channel, room):
+        # Lets the front acceptor forget which worker held the room
+        try:
+            channel.send(json.dumps({'closed': room}).encode())
+        except OSError as e:
+            print(f"Error notifying front of closed room {room}: {e}")
+
+def start_server(matchmaking=False, ratings_file=RATINGS_FILE, port=PORT, workers=None, ready=None, failed=None):
+    # ready and failed are optional threading.Events, set once connections
+    # are accepted or when the server stops on an error (port in use, ...)
+    if workers:
+        import sharding
+        sharding.run_sharded(workers, port=port, matchmaking=matchmaking, ratings_file=ratings_file, ready=ready, failed=failed)
+        return
+    server = CheckersServer(matchmaking=matchmaking, ratings_file=ratings_file, port=port)
+    server.start(ready, failed)
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Checkers LAN server")
+    parser.add_argument('--matchmaking', action='store_true', help="queue players and pair them by rating")
+    parser.add_argument('--ratings', default=RATINGS_FILE, help="file the player ratings are stored in")
+    parser.add_argument('--port', type=int, default=PORT, help="port to listen on")
+    parser.add_argument('--workers', type=int, help="run N worker processes and shard rooms across them")
+    args = parser.parse_args()
+    start_server(matchmaking=args.matchmaking, ratings_file=args.ratings, port=args.port, workers=args.workers)
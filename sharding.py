@@ -0,0 +1,235 @@
+import bisect
+import hashlib
+import json
+import multiprocessing
+import socket
+import threading
+import time
+
+from matchmaking import RATINGS_FILE
+from server import CheckersServer, DEFAULT_ROOM, PORT
+from transport import HEADER_SIZE
+
+# Sharding settings
+RING_REPLICAS = 64          # Virtual nodes per worker on the hash ring
+HANDSHAKE_TIMEOUT = 0.25    # Seconds to wait for a client's first message
+MAX_HANDSHAKE = 1024
+LOBBY_ROOM = "lobby"        # Matchmaking clients all share one worker's queue
+
+def ring_hash(key):
+    # Python's hash() is salted per process, so use a stable digest instead
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+class HashRing:
+    # Consistent hash ring mapping room ids onto worker names; removing a
+    # worker only moves the rooms that were placed on it
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self.keys = []    # sorted hashes of the virtual nodes
+        self.nodes = {}   # virtual node hash -> worker name
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            key = ring_hash(f"{node}#{i}")
+            self.nodes[key] = node
+            bisect.insort(self.keys, key)
+
+    def remove(self, node):
+        for i in range(self.replicas):
+            key = ring_hash(f"{node}#{i}")
+            if self.nodes.pop(key, None) is not None:
+                self.keys.pop(bisect.bisect_left(self.keys, key))
+
+    def get(self, room):
+        if not self.keys:
+            return None
+        pos = bisect.bisect(self.keys, ring_hash(room)) % len(self.keys)
+        return self.nodes[self.keys[pos]]
+
+class RoomRegistry:
+    # Remembers which worker holds each room so reconnects land on the
+    # worker that has the game state, even after the ring has changed
+    def __init__(self, ring):
+        self.ring = ring
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, room, alive, remember=True):
+        # Watchers do not create rooms, so their lookups are not remembered
+        with self.lock:
+            worker = self.rooms.get(room)
+            if worker is None or not alive(worker):
+                worker = self.ring.get(room)
+                if remember:
+                    self.rooms[room] = worker
+            return worker
+
+    def forget(self, room, worker):
+        # The worker has closed the room
+        with self.lock:
+            if self.rooms.get(room) == worker:
+                del self.rooms[room]
+
+    def drop_worker(self, worker):
+        with self.lock:
+            self.ring.remove(worker)
+            self.rooms = {room: w for room, w in self.rooms.items() if w != worker}
+
+def peek_handshake(conn, timeout=HANDSHAKE_TIMEOUT):
+    # Look at the client's first message without consuming it, so the worker
+    # still reads it as the first message on the connection
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        conn.settimeout(remaining)
+        try:
+            data = conn.recv(MAX_HANDSHAKE, socket.MSG_PEEK)
+        except (socket.timeout, OSError):
+            return None
+        if not data:
+            return None
+
+        try:
+            if len(data) >= HEADER_SIZE:
+                message_length = int(data[:HEADER_SIZE].strip())
+                if len(data) >= HEADER_SIZE + message_length:
+                    return json.loads(data[HEADER_SIZE:HEADER_SIZE + message_length])
+                if HEADER_SIZE + message_length > MAX_HANDSHAKE:
+                    return None
+        except ValueError:
+            return None
+        time.sleep(0.005)  # Partial message, wait for the rest
+
+def run_worker(name, channel, matchmaking, ratings_file):
+    server = CheckersServer(matchmaking=matchmaking, ratings_file=ratings_file)
+    print(f"Worker {name} ready")
+    server.serve_channel(channel)
+
+class ShardedServer:
+    # Front acceptor that owns the listening port, peeks at each client's
+    # first message to find its room and passes the connection's descriptor
+    # to the worker picked by the hash ring. SO_REUSEPORT is not used because
+    # the kernel balances connections by address, not by room.
+    def __init__(self, workers, port=PORT, matchmaking=False, ratings_file=RATINGS_FILE):
+        self.server = None  # Created after the workers are forked so they never inherit it
+        self.host = "0.0.0.0"  # Listen on all interfaces
+        self.port = port
+        self.addr = (self.host, self.port)
+
+        self.worker_count = workers
+        self.matchmaking = matchmaking
+        self.ratings_file = ratings_file
+        self.workers = {}  # worker name -> (process, channel)
+        self.registry = RoomRegistry(HashRing())
+
+    def spawn_workers(self):
+        for i in range(self.worker_count):
+            name = f"worker-{i}"
+            channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(name, worker_channel, self.matchmaking, self.ratings_file),
+                daemon=True
+            )
+            process.start()
+            worker_channel.close()
+            self.workers[name] = (process, channel)
+            self.registry.ring.add(name)
+
+            listener = threading.Thread(target=self.listen_worker, args=(name, channel))
+            listener.daemon = True
+            listener.start()
+
+    def listen_worker(self, name, channel):
+        # Workers report the rooms they close so the registry does not keep
+        # every room ever played
+        while True:
+            try:
+                message = channel.recv(MAX_HANDSHAKE)
+            except OSError:
+                break
+            if not message:
+                break
+            room = json.loads(message).get('closed')
+            if room is not None:
+                self.registry.forget(room, name)
+
+    def is_alive(self, name):
+        worker = self.workers.get(name)
+        return worker is not None and worker[0].is_alive()
+
+    def route(self, room, remember=True):
+        name = self.registry.lookup(room, self.is_alive, remember)
+        while name is not None and not self.is_alive(name):
+            # A dead worker's rooms move to the next worker on the ring
+            print(f"{name} is down, moving its rooms")
+            self.registry.drop_worker(name)
+            name = self.registry.lookup(room, self.is_alive, remember)
+        return name
+
+    def hand_off(self, conn, addr):
+        # Clients pick a room by sending their join, watch or queue message
+        # right after connecting, before reading the worker's welcome
+        try:
+            handshake = peek_handshake(conn)
+            conn.setblocking(True)
+
+            handoff_room = None
+            message_type = handshake.get('type') if isinstance(handshake, dict) else None
+            if message_type == 'join':
+                room = str(handshake.get('room', DEFAULT_ROOM))
+            elif message_type == 'watch' and 'room' in handshake:
+                room = str(handshake['room'])
+            elif handshake is None:
+                # Clients that wait for the server to speak first join the default room
+                room = handoff_room = DEFAULT_ROOM
+            else:
+                # Queue players and anything without a room (hello, watch by
+                # game id) go unseated to the lobby worker, where the matched
+                # games and their ids live
+                room = LOBBY_ROOM
+
+            name = self.route(room, remember=message_type != 'watch')
+            if name is None:
+                print("No workers left, rejecting connection")
+                return
+            message = json.dumps({'addr': addr, 'room': handoff_room}).encode()
+            socket.send_fds(self.workers[name][1], [message], [conn.fileno()])
+        except Exception as e:
+            print(f"Error handing off {addr}: {e}")
+        finally:
+            # The worker has its own copy of the descriptor now
+            conn.close()
+
+    def start(self, ready=None, failed=None):
+        try:
+            self.spawn_workers()
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind(self.addr)
+            self.server.listen(128)
+            print(f"Checkers server started on {self.host}:{self.port} with {self.worker_count} workers")
+            if ready is not None:
+                ready.set()
+
+            while True:
+                conn, addr = self.server.accept()
+                thread = threading.Thread(target=self.hand_off, args=(conn, addr))
+                thread.daemon = True
+                thread.start()
+
+        except Exception as e:
+            print(f"Server error: {e}")
+            if failed is not None:
+                failed.set()
+        finally:
+            if self.server is not None:
+                self.server.close()
+
+def run_sharded(workers, port=PORT, matchmaking=False, ratings_file=RATINGS_FILE, ready=None, failed=None):
+    server = ShardedServer(workers, port=port, matchmaking=matchmaking, ratings_file=ratings_file)
+    server.start(ready, failed)
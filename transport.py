@@ -0,0 +1,194 @@
+import json
+import socket
+import threading
+import zlib
+
+# Framing: a HEADER_SIZE-wide length field followed by the JSON payload.
+# A compressed payload is marked by a 'z' in the last header byte, which
+# is otherwise always padding.
+HEADER_SIZE = 10
+COMPRESSED_FLAG = b"z"
+COMPRESS_THRESHOLD = 1024   # Only payloads at least this big are compressed
+COMPRESS_LEVEL = 6
+CODECS = ['zlib']
+MAX_IOVECS = 512            # Buffers handed to one sendmsg call
+MAX_QUEUED_BYTES = 1 << 20  # Unsent bytes a connection may hold before queue() refuses more
+
+def recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+def recv_message(sock):
+    header = recv_exact(sock, HEADER_SIZE)
+    if not header:
+        return None
+    compressed = header[-1:] == COMPRESSED_FLAG
+    length = int(header[:-1].strip() if compressed else header.strip())
+    payload = recv_exact(sock, length)
+    if payload is None:
+        return None
+    if compressed:
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+class Message:
+    # One encoded message that can be queued on many connections; the
+    # compressed form is built at most once, on first use
+    def __init__(self, data):
+        self.payload = json.dumps(data).encode()
+        self.header = f"{len(self.payload):<{HEADER_SIZE}}".encode()
+        self._compressed = None
+
+    def frame(self, compress):
+        if not compress or len(self.payload) < COMPRESS_THRESHOLD:
+            return self.header, self.payload
+        if self._compressed is None:
+            payload = zlib.compress(self.payload, COMPRESS_LEVEL)
+            header = f"{len(payload):<{HEADER_SIZE - 1}}".encode() + COMPRESSED_FLAG
+            self._compressed = (header, payload)
+        return self._compressed
+
+class TransportStats:
+    def __init__(self):
+        self.messages = 0
+        self.syscalls = 0
+        self.payload_bytes = 0  # JSON bytes before compression and framing
+        self.wire_bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, messages, syscalls, payload_bytes, wire_bytes):
+        with self.lock:
+            self.messages += messages
+            self.syscalls += syscalls
+            self.payload_bytes += payload_bytes
+            self.wire_bytes += wire_bytes
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'messages': self.messages,
+                'syscalls': self.syscalls,
+                'syscalls_per_message': self.syscalls / self.messages if self.messages else 0.0,
+                'payload_bytes': self.payload_bytes,
+                'wire_bytes': self.wire_bytes,
+                'wire_ratio': self.wire_bytes / self.payload_bytes if self.payload_bytes else 0.0
+            }
+
+class Connection:
+    # Outbound messages are queued and written together with one vectored
+    # sendmsg per flush instead of one send per message. The buffer lock is
+    # never held during a send, so queueing onto a connection whose peer has
+    # stopped reading does not block the caller.
+    def __init__(self, sock, stats=None, max_queued=MAX_QUEUED_BYTES):
+        self.sock = sock
+        self.stats = stats or TransportStats()
+        self.compress = False
+        self.max_queued = max_queued
+        self.buffers = []
+        self.queued_bytes = 0
+        self.queued_messages = 0
+        self.queued_payload = 0
+        self.lock = threading.Lock()       # Guards the buffers and counters
+        self.send_lock = threading.Lock()  # Held by the thread writing to the socket
+
+    def negotiate(self, codecs):
+        # Use compression only if the client asked for a codec we support
+        self.compress = any(codec in CODECS for codec in codecs or [])
+        return CODECS[0] if self.compress else None
+
+    def queue(self, data):
+        # Returns False, dropping the message, once the peer is max_queued
+        # bytes behind
+        message = data if isinstance(data, Message) else Message(data)
+        header, payload = message.frame(self.compress)
+        size = len(header) + len(payload)
+        with self.lock:
+            if self.queued_bytes + size > self.max_queued:
+                return False
+            self.buffers.append(header)
+            self.buffers.append(payload)
+            self.queued_bytes += size
+            self.queued_messages += 1
+            self.queued_payload += len(message.payload)
+        return True
+
+    def flush(self, blocking=True):
+        # A non-blocking flush writes what the socket takes right now and
+        # keeps the rest queued. Returns True once everything is written,
+        # False if bytes are left or another thread is already sending.
+        if not self.send_lock.acquire(blocking):
+            return False
+        try:
+            with self.lock:
+                buffers = self.buffers
+                self.buffers = []
+                messages, payload = self.queued_messages, self.queued_payload
+                self.queued_messages = 0
+                self.queued_payload = 0
+
+            syscalls = 0
+            wire_bytes = 0
+            failed = False
+            try:
+                while buffers:
+                    sent = self.sock.sendmsg(buffers[:MAX_IOVECS], [], 0 if blocking else socket.MSG_DONTWAIT)
+                    syscalls += 1
+                    wire_bytes += sent
+                    self._consume(buffers, sent)
+            except BlockingIOError:
+                pass
+            except OSError:
+                failed = True
+                raise
+            finally:
+                self.stats.add(messages, syscalls, payload, wire_bytes)
+                with self.lock:
+                    if failed:
+                        # The peer is gone; drop what it will never read
+                        self.buffers = []
+                        self.queued_bytes = 0
+                    else:
+                        # Unsent bytes go back ahead of anything queued meanwhile
+                        self.buffers[:0] = buffers
+                        self.queued_bytes -= wire_bytes
+            return not buffers
+        finally:
+            self.send_lock.release()
+
+    def _consume(self, buffers, sent):
+        # Drop fully written buffers and trim a partially written one
+        i = 0
+        while i < len(buffers) and sent >= len(buffers[i]):
+            sent -= len(buffers[i])
+            i += 1
+        del buffers[:i]
+        if sent:
+            buffers[0] = buffers[0][sent:]
+
+    def send(self, data):
+        self.queue(data)
+        self.flush()
+
+    def has_input(self):
+        # True when another request is already waiting to be read
+        try:
+            return bool(self.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT))
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return False
+
+    def recv(self):
+        return recv_message(self.sock)
+
+    def shutdown(self):
+        # Wakes up the thread reading from this connection, which then cleans up
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass